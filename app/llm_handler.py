@@ -1,7 +1,27 @@
+import inspect
+import logging
+
+import httpx
 import litellm
 from dotenv import load_dotenv
 from typing import Optional
 
+# Read .env once at import instead of on every request
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Marker that ends a tool call; generation stops as soon as it is produced
+TOOL_CALL_STOP = "</tool_call>"
+
+# Connection pool shared by every upstream LLM request. A stream holds its
+# connection for the whole response, so the cap matches the openai SDK's
+# default. The SDK overrides the client's timeout on every request, so
+# HTTP_TIMEOUT is also passed to each completion call; that is what makes
+# waiting for a free connection fail fast instead of hanging.
+HTTP_LIMITS = httpx.Limits(max_connections=1000, max_keepalive_connections=100)
+HTTP_TIMEOUT = httpx.Timeout(600.0, connect=5.0, pool=10.0)
+
 
 class InvalidAPIKeyError(Exception):
     """Raised when an API key is invalid or missing."""
@@ -40,19 +60,52 @@ def validate_api_key(api_key: Optional[str] = None, model: str = None) -> None:
 
 
 def configure_llm(api_key: str = None, api_base_url: str = None, model: str = None):
-    """Configure LiteLLM with API keys and settings."""
-    load_dotenv()
-
-    if api_key:
-        litellm.api_key = api_key
-    if api_base_url:
-        litellm.api_base = api_base_url
+    """Check LLM settings before a request.
 
-    # Validate API key
+    Credentials are passed to each LiteLLM call instead of being stored on
+    the litellm module, so concurrent requests never see each other's keys.
+    """
     validate_api_key(api_key, model)
 
-    # Initialize headers
-    litellm.headers = {}
+
+def open_http_client() -> None:
+    """Create the shared HTTP client used for LLM calls.
+
+    LiteLLM reuses ``litellm.aclient_session`` for the clients it builds, so
+    TCP/TLS connections to the provider are kept alive across requests
+    instead of being set up for every completion.
+    """
+    if litellm.aclient_session is None:
+        litellm.aclient_session = httpx.AsyncClient(
+            limits=HTTP_LIMITS, timeout=HTTP_TIMEOUT
+        )
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client created by open_http_client."""
+    client = litellm.aclient_session
+    litellm.aclient_session = None
+    if client is not None:
+        await client.aclose()
+
+
+async def close_completion_stream(response) -> None:
+    """Close the provider stream behind a LiteLLM streaming response.
+
+    Stops the provider from generating tokens nobody will read when the
+    client goes away mid-stream. Streams without a close method are left
+    to the garbage collector.
+    """
+    stream = getattr(response, "completion_stream", None)
+    close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+    if close is None:
+        return
+    try:
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+    except Exception:
+        logger.debug("Failed to close completion stream", exc_info=True)
 
 
 async def stream_llm_response(
@@ -76,27 +129,33 @@ async def stream_llm_response(
         if not messages:
             messages = []
 
-        # Configure LLM with provided credentials
+        # Check the provided credentials
         configure_llm(api_key, api_base_url, model)
 
         # Create the response stream with stop sequence
         response = await litellm.acompletion(
             model=model,
             messages=messages,
+            api_key=api_key,
+            api_base=api_base_url,
             stream=True,
+            timeout=HTTP_TIMEOUT,
             temperature=0.3,
-            stop=["</tool_call>"],  # Stop after our explicit marker
-            extra_headers=litellm.headers
+            stop=[TOOL_CALL_STOP],  # Stop after our explicit marker
         )
 
         # Simply yield each chunk directly
-        async for chunk in response:
-            yield chunk
-
-    except Exception as e:
-        # Simple error handling - just print the error
-        print(f"\nError in stream_llm_response: {type(e).__name__}: {str(e)}")
-        print(f"Messages: {len(messages)} items")
+        try:
+            async for chunk in response:
+                yield chunk
+        finally:
+            # Release the provider connection even if the client went away
+            await close_completion_stream(response)
+
+    except Exception:
+        logger.exception(
+            "Error in stream_llm_response (%d messages)", len(messages)
+        )
 
         # Re-raise to let the caller handle it
         raise
@@ -1,5 +1,6 @@
 import asyncio
 import os
+from contextlib import AsyncExitStack
 from typing import Optional
 
 from mcp import ClientSession, StdioServerParameters
@@ -10,10 +11,7 @@ class MCPHandler:
     _instance: Optional['MCPHandler'] = None
     _initialized = False
     _session: Optional[ClientSession] = None
-    _client_ctx = None
-    _session_ctx = None
-    _read = None
-    _write = None
+    _exit_stack: Optional[AsyncExitStack] = None
     _initialization_lock = asyncio.Lock()
     
     def __new__(cls):
@@ -47,13 +45,14 @@ class MCPHandler:
             )
             
             try:
-                # Create and enter client context
-                self._client_ctx = stdio_client(server_params)
-                self._read, self._write = await self._client_ctx.__aenter__()
-                
-                # Create and enter session context
-                self._session = ClientSession(self._read, self._write)
-                await self._session.__aenter__()
+                # Keep the client and session contexts open until close()
+                self._exit_stack = AsyncExitStack()
+                read, write = await self._exit_stack.enter_async_context(
+                    stdio_client(server_params)
+                )
+                self._session = await self._exit_stack.enter_async_context(
+                    ClientSession(read, write)
+                )
                 await self._session.initialize()
                 
                 self._initialized = True
@@ -65,22 +64,15 @@ class MCPHandler:
     
     async def close(self):
         """Gracefully close the MCP session and client"""
-        if self._session:
-            try:
-                await self._session.__aexit__(None, None, None)
-            except Exception:
-                pass
-            self._session = None
-            
-        if self._client_ctx:
+        if self._exit_stack:
             try:
-                await self._client_ctx.__aexit__(None, None, None)
+                # Exits the session first, then the stdio client
+                await self._exit_stack.aclose()
             except Exception:
                 pass
-            self._client_ctx = None
-            
-        self._read = None
-        self._write = None
+            self._exit_stack = None
+
+        self._session = None
         self._initialized = False
     
     async def ensure_initialized(self):
@@ -97,6 +89,26 @@ class MCPHandler:
         """Call an MCP tool with the given arguments"""
         await self.ensure_initialized()
         return await self._session.call_tool(tool_name, **kwargs)
+
+    async def list_prompts(self):
+        """List available MCP prompts"""
+        await self.ensure_initialized()
+        return await self._session.list_prompts()
+
+    async def get_prompt(self, prompt_name: str, arguments: Optional[dict] = None):
+        """Get an MCP prompt rendered with the given arguments"""
+        await self.ensure_initialized()
+        return await self._session.get_prompt(prompt_name, arguments=arguments)
+
+    async def list_resources(self):
+        """List available MCP resources"""
+        await self.ensure_initialized()
+        return await self._session.list_resources()
+
+    async def read_resource(self, resource_path: str):
+        """Read an MCP resource by its URI"""
+        await self.ensure_initialized()
+        return await self._session.read_resource(resource_path)
     
     @property
     def is_initialized(self) -> bool:
@@ -1,8 +1,6 @@
-import json
+import orjson
 
-
-def get_system_prompt(tools) -> str:
-    system_prompt = """
+_NASH_TEMPLATE = """
 # Assistant Identity and Capabilities
 
 You are Nash, an AI assistant created to help users with any task. You have a wide range of capabilities including answering questions, creative writing, problem-solving, and data analysis. You can access external tools to enhance your abilities and provide users with accurate, helpful information and assistance.
@@ -78,27 +76,49 @@ When relevant to the user's needs, you can provide guidance on how they can inte
 When first activated, before responding to any user query, silently verify you've read all instructions by checking for the key instruction about always ending a tool call with </tool_call> in your response.
 """
 
+# Split once around the single placeholder; the template's edges are trimmed
+# here so the assembled prompt needs no format() or strip() per build
+_NASH_HEAD, _NASH_TAIL = _NASH_TEMPLATE.split("{tools_system_prompt}")
+_NASH_HEAD = _NASH_HEAD.lstrip()
+_NASH_TAIL = _NASH_TAIL.rstrip()
+
+# Built system prompts keyed by a fingerprint of the tool list
+_SYSTEM_PROMPT_CACHE: dict[tuple, str] = {}
+
+
+def get_system_prompt(tools) -> str:
+    key = tuple(
+        (tool.name, tool.description, repr(tool.inputSchema))
+        for tool in tools.tools
+    )
+    cached = _SYSTEM_PROMPT_CACHE.get(key)
+    if cached is not None:
+        return cached
+
     tools_dict = convert_tools_to_dict(tools)
-    tools_system_prompt = generate_tool_system_prompt(tool_definitions=json.dumps(tools_dict, indent=2), formatting_instructions=format_instructions(), user_system_prompt="", tool_configuration="")
-    return system_prompt.format(
-        tools_system_prompt=tools_system_prompt
-    ).strip()
+    # Compact JSON: the model reads it just as well and it costs fewer tokens
+    tool_definitions = orjson.dumps(tools_dict).decode()
+    tools_system_prompt = generate_tool_system_prompt(tool_definitions, FORMAT_INSTRUCTIONS)
+    result = _NASH_HEAD + tools_system_prompt + _NASH_TAIL
+    _SYSTEM_PROMPT_CACHE[key] = result
+    return result
 
 
 def convert_tools_to_dict(tools_result):
     """Convert MCP tools result to JSON-serializable format."""
-    tools = []
-    for tool in tools_result.tools:
-        tools.append({
+    tools = [
+        {
             "name": tool.name,
             "description": tool.description,
             "parameters": tool.inputSchema
-        })
+        }
+        for tool in tools_result.tools
+    ]
     return {"tools": tools}
 
 
-def format_instructions():
-    return """When a user's request requires using a tool, you MUST format your response as follows:
+# Tool call formatting rules, embedded in the tool section of the prompt
+FORMAT_INSTRUCTIONS = """When a user's request requires using a tool, you MUST format your response as follows:
 
 1. You may provide a brief introduction or context (OPTIONAL and ONLY before the tool call)
 2. Make ONE and ONLY ONE tool call using this exact format:
@@ -206,6 +226,18 @@ You must ALWAYS end a tool call with </tool_call> in your response. You should N
 """
 
 
+def format_instructions():
+    return FORMAT_INSTRUCTIONS
+
+
+# Fixed text around the slots of the tool system prompt
+_TOOL_PROMPT_HEAD = (
+    "In this environment you have access to a set of tools you can use to "
+    "answer the user's question.\n"
+)
+_TOOL_PROMPT_MID = "\nHere are the available tools:\n"
+
+
 def generate_tool_system_prompt(
     tool_definitions: str = "",
     formatting_instructions: str = "",
@@ -223,13 +255,9 @@ def generate_tool_system_prompt(
     Returns:
         Formatted system prompt string
     """
-    prompt_template = """In this environment you have access to a set of tools you can use to answer the user's question.
-{formatting_instructions}
-Here are the available tools:
-{tool_definitions}
-""".format(
-        formatting_instructions=formatting_instructions,
-        tool_definitions=tool_definitions,
-    ).strip()
-
-    return prompt_template
+    return "".join((
+        _TOOL_PROMPT_HEAD,
+        formatting_instructions,
+        _TOOL_PROMPT_MID,
+        tool_definitions,
+    )).rstrip()
@@ -1,20 +1,93 @@
 from typing import List, Optional
 from pydantic import BaseModel, Field
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import APIRouter, FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-import json
+from fastapi.responses import ORJSONResponse, Response
+import asyncio
+import logging
+import os
+from contextlib import aclosing, asynccontextmanager
+from types import MappingProxyType
+
+import orjson
+from sse_starlette.sse import EventSourceResponse
 
 from .llm_handler import (
-    stream_llm_response, 
-    validate_api_key, InvalidAPIKeyError
+    stream_llm_response, TOOL_CALL_STOP,
+    validate_api_key, InvalidAPIKeyError,
+    open_http_client, close_http_client
 )
 from .mcp_handler import MCPHandler
 from .prompts import get_system_prompt
 
+# SSE frame framing; payloads are pre-encoded bytes so Starlette skips the str encode
+_SSE_PREFIX = b"data: "
+_SSE_SUFFIX = b"\n\n"
+
+# End of stream marker, sent once per response
+_DONE = _SSE_PREFIX + b"[DONE]" + _SSE_SUFFIX
+
+# Health check body, encoded once for frequent liveness probes
+_HEALTH_OK = orjson.dumps({"status": "ok"})
+
+# Seconds between keep-alive comments, so proxies don't drop a stream that
+# is quiet while a tool call or a slow first token is pending.
+# EventSourceResponse also sets the no-cache/no-buffering headers.
+_SSE_PING_INTERVAL = 15
+
+# Content deltas are coalesced into SSE frames. The first frame carries
+# STREAM_MIN_BATCH_SIZE tokens and each later one STREAM_BATCH_GROWTH_FACTOR
+# times more, up to STREAM_MAX_BATCH_SIZE. A partial batch is sent after
+# STREAM_BATCH_WINDOW_MS milliseconds when tokens arrive slowly.
+STREAM_MIN_BATCH_SIZE = int(os.getenv("STREAM_MIN_BATCH_SIZE", "1"))
+STREAM_MAX_BATCH_SIZE = int(os.getenv("STREAM_MAX_BATCH_SIZE", "50"))
+STREAM_BATCH_GROWTH_FACTOR = int(os.getenv("STREAM_BATCH_GROWTH_FACTOR", "3"))
+STREAM_BATCH_WINDOW = int(os.getenv("STREAM_BATCH_WINDOW_MS", "15")) / 1000
+
+# Content pieces read ahead from the provider while the client catches up
+STREAM_BUFFER_SIZE = int(os.getenv("STREAM_BUFFER_SIZE", "64"))
+
+# Queue item marking the end of the upstream content
+_END = object()
+
+logger = logging.getLogger(__name__)
+
+# Process-wide MCP singleton, bound once instead of looked up per request
+mcp_handler = MCPHandler.get_instance()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Configure services on server startup and clean them up on shutdown."""
+    # Pooled HTTP client reused by all LLM requests
+    open_http_client()
+
+    # Initialize MCP singleton
+    await mcp_handler.initialize()
+
+    # Get available tools
+    tools = await mcp_handler.list_tools()
+
+    # Generate system prompt with tool definitions and store in app state
+    app.state.system_prompt = get_system_prompt(tools)
+
+    # Build both system message forms once; requests share them read-only
+    app.state.system_message = build_system_message(app.state.system_prompt)
+    app.state.cached_system_message = build_system_message(
+        app.state.system_prompt, cacheable=True
+    )
+
+    yield
+
+    await mcp_handler.close()
+    await close_http_client()
 
 
-app = FastAPI(title="Nash LLM Server")
+app = FastAPI(
+    title="Nash LLM Server",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 # Add CORS middleware
 app.add_middleware(
@@ -57,32 +130,149 @@ class StreamRequest(BaseRequest):
         ...,
         description="Model to use for completion"
     )
-
-
-@app.on_event("startup")
-async def startup_event():
-    """Configure services on server startup."""
-    # Initialize MCP singleton
-    mcp = MCPHandler.get_instance()
-    await mcp.initialize()
-
-    # Get available tools
-    tools = await mcp.list_tools()
-
-    # Generate system prompt with tool definitions and store in app state
-    app.state.system_prompt = get_system_prompt(tools)
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on server shutdown."""
-    mcp = MCPHandler.get_instance()
-    await mcp.close()
+    min_batch_size: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Tokens in the first streamed frame"
+    )
+    max_batch_size: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Upper bound on tokens per streamed frame"
+    )
+    batch_size_growth_factor: Optional[int] = Field(
+        None,
+        ge=1,
+        description="Multiplier applied to the batch size after each frame"
+    )
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "ok"}
+    return Response(content=_HEALTH_OK, media_type="application/json")
+
+
+async def iter_content(stream):
+    """Yield the text of each content delta in a raw LiteLLM stream."""
+    async with aclosing(stream):
+        async for chunk in stream:
+            # Nearly every raw LiteLLM chunk carries a delta, so read it directly
+            # and only pay for the exception on the rare empty/role-only chunks
+            try:
+                content = chunk.choices[0].delta.content
+            except (AttributeError, IndexError, TypeError):
+                continue
+            if content:
+                yield content
+
+
+async def stop_at(contents, stop: str):
+    """Yield content up to, but not including, the first occurrence of stop.
+
+    Some providers (Ollama and other OpenAI-compatible servers) ignore the
+    stop parameter and keep generating, so the stream is cut here as well.
+    A trailing partial match is held back until the next piece shows
+    whether it completes the stop sequence.
+    """
+    held = ""
+    # Closing contents on an early stop releases the upstream request now
+    # instead of whenever the generator chain is collected
+    async with aclosing(contents):
+        async for content in contents:
+            text = held + content
+            index = text.find(stop)
+            if index != -1:
+                if index:
+                    yield text[:index]
+                return
+            # Earliest suffix of text that is still a prefix of stop
+            start = text.find(stop[0], max(len(text) - len(stop) + 1, 0))
+            while start != -1 and not stop.startswith(text[start:]):
+                start = text.find(stop[0], start + 1)
+            if start == -1:
+                held = ""
+            else:
+                held = text[start:]
+                text = text[:start]
+            if text:
+                yield text
+    if held:
+        yield held
+
+
+async def read_ahead(contents, queue: asyncio.Queue):
+    """Move content pieces into queue, ending with _END or the error raised."""
+    try:
+        async for piece in contents:
+            await queue.put(piece)
+    except Exception as e:
+        await queue.put(e)
+    else:
+        await queue.put(_END)
+
+
+async def batch_content(
+    contents,
+    min_batch_size: int,
+    max_batch_size: int,
+    growth_factor: int,
+    batch_window: float,
+    buffer_size: int = STREAM_BUFFER_SIZE,
+):
+    """Coalesce content pieces so one SSE frame carries several tokens.
+
+    The first batch holds min_batch_size pieces so time to first token is
+    unaffected; each flush multiplies the size by growth_factor, capped at
+    max_batch_size. A batch is also flushed batch_window seconds after its
+    first piece arrived, so a pause upstream never holds back text that
+    was already received.
+
+    Upstream is drained by a separate task into a queue of buffer_size
+    pieces, so a slow client does not stall reads from the provider.
+    """
+    batch_size = min_batch_size
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(buffer_size)
+    reader = asyncio.create_task(read_ahead(contents, queue))
+    batch = []
+    deadline = 0.0
+    try:
+        while True:
+            if batch and queue.empty():
+                try:
+                    item = await asyncio.wait_for(
+                        queue.get(), max(deadline - loop.time(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    yield "".join(batch)
+                    batch = []
+                    batch_size = min(batch_size * growth_factor, max_batch_size)
+                    continue
+            else:
+                item = await queue.get()
+            if item is _END:
+                break
+            if isinstance(item, Exception):
+                # Deliver what was already received before surfacing the error
+                if batch:
+                    yield "".join(batch)
+                raise item
+            if not batch:
+                deadline = loop.time() + batch_window
+            batch.append(item)
+            if len(batch) >= batch_size:
+                yield "".join(batch)
+                batch = []
+                batch_size = min(batch_size * growth_factor, max_batch_size)
+        if batch:
+            yield "".join(batch)
+    finally:
+        reader.cancel()
+
+
+def sse(obj) -> bytes:
+    """Encode an object as a single SSE data frame."""
+    return _SSE_PREFIX + orjson.dumps(obj) + _SSE_SUFFIX
 
 
 async def process_llm_stream(
@@ -90,175 +280,207 @@ async def process_llm_stream(
     model: str,
     api_key: str,
     api_base_url: str,
+    min_batch_size: int = STREAM_MIN_BATCH_SIZE,
+    max_batch_size: int = STREAM_MAX_BATCH_SIZE,
+    batch_size_growth_factor: int = STREAM_BATCH_GROWTH_FACTOR,
 ):
     """Format LLM responses into proper SSE format."""
+    stream = stream_llm_response(
+        messages=messages,
+        model=model,
+        api_key=api_key,
+        api_base_url=api_base_url
+    )
+    contents = stop_at(iter_content(stream), TOOL_CALL_STOP)
     # Stream content chunks
     try:
-        async for chunk in stream_llm_response(
-            messages=messages,
-            model=model,
-            api_key=api_key,
-            api_base_url=api_base_url
+        async for content in batch_content(
+            contents,
+            min(min_batch_size, max_batch_size),
+            max_batch_size,
+            batch_size_growth_factor,
+            STREAM_BATCH_WINDOW
         ):
-            # Process the raw LiteLLM chunk
-            if hasattr(chunk, 'choices') and chunk.choices:
-                # Extract the content from the choices
-                delta = chunk.choices[0].delta
-                if hasattr(delta, 'content') and delta.content:
-                    content = delta.content
-                    # Format as SSE event
-                    yield f"data: {json.dumps({'content': content})}\n\n"
+            yield sse({'content': content})
     except Exception as e:
         # Handle errors in streaming
-        yield f"data: {json.dumps({'error': str(e)})}\n\n"
-    
+        yield sse({'error': str(e)})
+
     # End of stream marker
-    yield "data: [DONE]\n\n"
+    yield _DONE
+
+
+async def error_stream(error_msg: str):
+    """Send a single error event followed by the end of stream marker."""
+    yield sse({'error': error_msg})
+    yield _DONE
+
+
+def uses_prompt_caching(model: str) -> bool:
+    """Return True for Anthropic models, which support cache breakpoints."""
+    return model.startswith(("anthropic/", "claude"))
+
+
+def build_system_message(system_prompt: str, cacheable: bool = False) -> dict:
+    """Build the system message, optionally marking it cacheable.
+
+    The system prompt is large and identical across requests, so a cache
+    breakpoint lets Anthropic reuse it instead of re-reading it every turn.
+    """
+    if cacheable:
+        return {
+            "role": "system",
+            "content": [{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"}
+            }]
+        }
+    return {"role": "system", "content": system_prompt}
 
 
 @app.post("/v1/chat/completions/stream")
 async def stream_completion(request: StreamRequest):
     """Stream chat completions with user-provided credentials."""
     try:
-        messages = [{"role": "system", "content": app.state.system_prompt}]
-        messages.extend([msg.dict() for msg in request.messages])
-        
-        async def error_stream(error_msg: str):
-            yield f"data: {json.dumps({'error': error_msg})}\n\n"
-            yield "data: [DONE]\n\n"
+        if uses_prompt_caching(request.model):
+            messages = [app.state.cached_system_message]
+        else:
+            messages = [app.state.system_message]
+        # Message has only role and content, so skip the pydantic serializer
+        messages.extend(
+            {"role": msg.role, "content": msg.content}
+            for msg in request.messages
+        )
 
         try:
             # Validate API key before starting stream
             validate_api_key(request.api_key, request.model)
         except InvalidAPIKeyError as e:
-            return StreamingResponse(
+            return EventSourceResponse(
                 error_stream(str(e)),
-                media_type="text/event-stream",
+                ping=_SSE_PING_INTERVAL,
                 status_code=401
             )
         
         # Format the response
-        return StreamingResponse(
+        return EventSourceResponse(
             process_llm_stream(
                 messages=messages,
                 model=request.model,
                 api_key=request.api_key,
-                api_base_url=request.api_base_url
+                api_base_url=request.api_base_url,
+                min_batch_size=request.min_batch_size or STREAM_MIN_BATCH_SIZE,
+                max_batch_size=request.max_batch_size or STREAM_MAX_BATCH_SIZE,
+                batch_size_growth_factor=(
+                    request.batch_size_growth_factor or STREAM_BATCH_GROWTH_FACTOR
+                )
             ),
-            media_type="text/event-stream"
+            ping=_SSE_PING_INTERVAL
         )
     except Exception as e:
-        return StreamingResponse(
+        return EventSourceResponse(
             error_stream(str(e)),
-            media_type="text/event-stream",
+            ping=_SSE_PING_INTERVAL,
             status_code=500
         )
 
 
-@app.post("/v1/mcp/list_tools")
-async def list_tools():
-    """List all available MCP tools."""
-    try:
-        mcp = MCPHandler.get_instance()
-        tools = await mcp.list_tools()
-        return {"tools": tools}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
+async def _read_json(request: Request) -> dict:
+    """Parse the request body with orjson, treating an empty body as {}.
 
-@app.post("/v1/mcp/list_prompts")
-async def list_prompts():
-    """List all available prompts."""
+    Raises:
+        HTTPException: 400 if the body is not a JSON object
+    """
+    body = await request.body()
+    if not body:
+        return {}
     try:
-        mcp = MCPHandler.get_instance()
-        prompts = await mcp.list_prompts()
-        return {"prompts": prompts}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
+        data = orjson.loads(body)
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(data, dict):
+        raise HTTPException(
+            status_code=400,
+            detail="Request body must be a JSON object"
+        )
+    return data
+
+
+# MCP methods exposed over HTTP: bound handler, response key, then the
+# required and optional request body fields passed as keyword arguments.
+# Built once and read-only, so dispatch is a single lookup.
+_MCP_METHODS = MappingProxyType({
+    "list_tools": (mcp_handler.list_tools, "tools", (), ()),
+    "list_prompts": (mcp_handler.list_prompts, "prompts", (), ()),
+    "get_prompt": (
+        mcp_handler.get_prompt, "prompt", ("prompt_name",), ("arguments",)
+    ),
+    "list_resources": (mcp_handler.list_resources, "resources", (), ()),
+    "read_resource": (
+        mcp_handler.read_resource, "content", ("resource_path",), ()
+    ),
+    "call_tool": (
+        mcp_handler.call_tool, "result", ("tool_name",), ("arguments",)
+    ),
+})
+
+
+# Internal MCP passthrough, kept out of the public OpenAPI schema
+mcp_router = APIRouter(prefix="/v1/mcp")
+
+
+@mcp_router.post("/{method}", include_in_schema=False)
+async def mcp_method(method: str, request: Request):
+    """Call an allow-listed MCP method with arguments from the request body."""
+    spec = _MCP_METHODS.get(method)
+    if spec is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Unknown MCP method: {method}"
+        )
+    handler, result_key, required, optional = spec
 
-@app.post("/v1/mcp/get_prompt")
-async def get_prompt(request: Request):
-    """Get a specific prompt."""
-    try:
-        data = await request.json()
-        prompt_name = data.get("prompt_name")
-        arguments = data.get("arguments", {})
-        
-        if not prompt_name:
+    data = await _read_json(request)
+    kwargs = {}
+    for name in required:
+        if not data.get(name):
             raise HTTPException(
-                status_code=400, 
-                detail="prompt_name is required"
+                status_code=400,
+                detail=f"{name} is required"
             )
-            
-        mcp = MCPHandler.get_instance()
-        prompt = await mcp.get_prompt(prompt_name, arguments=arguments)
-        return {"prompt": prompt}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
-
-@app.post("/v1/mcp/list_resources")
-async def list_resources():
-    """List all available resources."""
-    try:
-        mcp = MCPHandler.get_instance()
-        resources = await mcp.list_resources()
-        return {"resources": resources}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
+        kwargs[name] = data[name]
+    for name in optional:
+        if name in data:
+            kwargs[name] = data[name]
 
-@app.post("/v1/mcp/read_resource")
-async def read_resource(request: Request):
-    """Read a specific resource."""
+    # Only failures inside the MCP call itself are server errors
     try:
-        data = await request.json()
-        resource_path = data.get("resource_path")
-        
-        if not resource_path:
-            raise HTTPException(
-                status_code=400, 
-                detail="resource_path is required"
-            )
-            
-        mcp = MCPHandler.get_instance()
-        content = await mcp.read_resource(resource_path)
-        return {"content": content}
-    except HTTPException:
-        raise
+        result = await handler(**kwargs)
+        return {result_key: result}
     except Exception as e:
+        logger.exception("MCP %s failed", method)
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/v1/mcp/call_tool")
-async def call_tool(request: Request):
-    """Call a specific MCP tool."""
-    try:
-        data = await request.json()
-        tool_name = data.get("tool_name")
-        arguments = data.get("arguments", {})
-        
-        if not tool_name:
-            raise HTTPException(
-                status_code=400, 
-                detail="tool_name is required"
-            )
-            
-        mcp = MCPHandler.get_instance()
-        result = await mcp.call_tool(tool_name, arguments=arguments)
-        return {"result": result}
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+app.include_router(mcp_router)
 
 
 def main():
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=6274)
+    # With uvicorn[standard] installed the default "auto" loop and http
+    # settings pick uvloop and httptools where the platform supports them.
+    # Each worker starts its own MCP server, so scale out with care.
+    # Access logging is off by default (ACCESS_LOG=1 turns it on), and idle
+    # connections are kept long enough for clients to reuse them between turns.
+    uvicorn.run(
+        "app.server:app",
+        host="0.0.0.0",
+        port=6274,
+        workers=int(os.getenv("WEB_CONCURRENCY", "1")),
+        access_log=os.getenv("ACCESS_LOG", "0") == "1",
+        timeout_keep_alive=75,
+    )
 
 
 if __name__ == "__main__":
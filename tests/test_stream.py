@@ -0,0 +1,99 @@
+"""Tests for the content stream pipeline in app.server."""
+import asyncio
+
+import pytest
+
+from app.server import batch_content, stop_at
+
+
+async def pieces(*items, delay: float = 0):
+    """Yield items in order; an Exception item is raised instead."""
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+async def collect(stream) -> list:
+    return [piece async for piece in stream]
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def batches(contents, min_size=1, max_size=50, growth=3, window=0.015):
+    return batch_content(contents, min_size, max_size, growth, window)
+
+
+def test_stop_at_marker_split_across_pieces():
+    out = run(collect(stop_at(pieces("call</to", "ol_ca", "ll>ignored"), "</tool_call>")))
+    assert "".join(out) == "call"
+
+
+def test_stop_at_flushes_held_partial_tail_at_end_of_stream():
+    out = run(collect(stop_at(pieces("text</to", "ol"), "</tool_call>")))
+    # The partial match is held back, then released when the stream ends
+    assert out == ["text", "</tool"]
+
+
+def test_stop_at_releases_held_text_that_stops_matching():
+    out = run(collect(stop_at(pieces("a</t", "x"), "</tool_call>")))
+    assert "".join(out) == "a</tx"
+
+
+def test_batch_content_grows_batches():
+    out = run(collect(batches(pieces(*"abcdefghij"), min_size=1, max_size=4, growth=2)))
+    assert out == ["a", "bc", "defg", "hij"]
+
+
+def test_batch_content_flushes_buffered_text_before_error():
+    async def consume():
+        out = []
+        with pytest.raises(RuntimeError, match="upstream failed"):
+            async for batch in batches(pieces("a", "b", RuntimeError("upstream failed")), min_size=10):
+                out.append(batch)
+        return out
+
+    assert run(consume()) == ["ab"]
+
+
+def test_batch_content_flushes_partial_batch_after_window():
+    async def consume():
+        stream = batches(pieces("a", "b", "late", delay=0.05), min_size=10, window=0.01)
+        try:
+            # Each piece arrives after the window has passed, so none waits
+            # for the batch to fill up
+            return [await asyncio.wait_for(stream.__anext__(), 1) for _ in range(3)]
+        finally:
+            await stream.aclose()
+
+    assert run(consume()) == ["a", "b", "late"]
+
+
+def test_batch_content_cancellation_closes_upstream():
+    async def consume():
+        closed = asyncio.Event()
+        received = asyncio.Event()
+
+        async def upstream():
+            try:
+                yield "first"
+                # Simulate a provider that goes quiet mid-stream
+                await asyncio.Event().wait()
+            finally:
+                closed.set()
+
+        async def client():
+            async for _ in batches(upstream()):
+                received.set()
+
+        task = asyncio.create_task(client())
+        await asyncio.wait_for(received.wait(), 1)
+        task.cancel()
+        await asyncio.wait_for(closed.wait(), 1)
+        return task.cancelled()
+
+    assert run(consume())